@@ -2,9 +2,12 @@
 """Generate all Thoth app icons from the 𓅝 ibis hieroglyph.
 
 Requires Pillow and the Noto Sans Egyptian Hieroglyphs font (bundled with macOS).
+NumPy and SciPy are optional: without SciPy the tray silhouette uses a Numba
+flood fill if Numba is installed, otherwise the slower pure-Python one in
+icon_flood_fill.py (which can be compiled with mypyc, see that module).
 
 Usage:
-    nix shell --impure --expr 'let pkgs = import <nixpkgs> {}; in pkgs.python3.withPackages (ps: [ps.pillow])' \
+    nix shell --impure --expr 'let pkgs = import <nixpkgs> {}; in pkgs.python3.withPackages (ps: [ps.pillow ps.numpy ps.scipy])' \
         --command python3 scripts/generate_icons.py
 
     Then generate .icns separately:
@@ -15,14 +18,40 @@ Design:
     - Tray idle: black glyph on transparent (template icon, macOS tints)
     - Tray recording: amber glyph on transparent
     - Favicon: same as app icon, scaled to 32x32
+
+Rendering:
+    - Each app icon size is rendered once, directly (sizes below 64 at 4x,
+      then one LANCZOS downscale), and shared by every output of that size;
+      nothing is rendered at one size and then resized via another.
+    - The tray silhouette is rendered once at TRAY_SUPERSAMPLE x the largest
+      tray size; each tray icon is a single BOX downscale of it.
 """
 
+from functools import lru_cache
 from pathlib import Path
 import os
+import subprocess
 import tempfile
 
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
+from icon_flood_fill import flood_exterior
+
+try:
+    import numpy as np
+except ImportError:  # Pure-Python flood_exterior() instead
+    np = None
+
+njit = None
+try:
+    from scipy.ndimage import binary_fill_holes
+except ImportError:
+    binary_fill_holes = None
+    try:  # Numba is only worth importing when SciPy is missing
+        from numba import njit
+    except ImportError:
+        pass
+
 # Resolve paths relative to this script (project root)
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -40,6 +69,48 @@ BORDER_COLOUR = (54, 51, 48, 255)
 # Glyph scale: 66% of icon size (adjust to make bird larger/smaller)
 GLYPH_SCALE = 0.66
 
+# Tray icon variants: (name, colour) at each size (22 standard, 44 Retina)
+TRAY_SIZES = [22, 44]
+TRAY_VARIANTS = [("idle", (0, 0, 0)), ("recording", AMBER[:3])]
+
+# The tray silhouette is a binary mask, so 4x supersampling of the largest
+# tray size is enough for smooth edges; more only multiplies the pixel work
+TRAY_SUPERSAMPLE = 4
+
+# PNGs that ship in the app bundle are worth the slowest, smallest encode
+SHIPPED_PNG_OPTIONS = {"optimize": True, "compress_level": 9}
+
+
+# ============================================================================
+# Font
+# ============================================================================
+
+@lru_cache(maxsize=None)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    """Load the hieroglyph font at a given size (parsed once per size)."""
+    return ImageFont.truetype(FONT_PATH, size)
+
+
+@lru_cache(maxsize=None)
+def _glyph_bbox(size: int) -> tuple[int, int, int, int]:
+    """Bounding box of CHAR at a given font size."""
+    return _font(size).getbbox(CHAR)
+
+
+@lru_cache(maxsize=None)
+def _centered_xy(font_size: int, canvas_size: int, y_bias: float = 0.0) -> tuple[int, int]:
+    """Text origin that centres CHAR on a square canvas.
+
+    ``y_bias`` shifts the glyph up by that fraction of the canvas size.
+    """
+    bbox = _glyph_bbox(font_size)
+    glyph_w = bbox[2] - bbox[0]
+    glyph_h = bbox[3] - bbox[1]
+
+    x = (canvas_size - glyph_w) // 2 - bbox[0]
+    y = (canvas_size - glyph_h) // 2 - bbox[1] - int(canvas_size * y_bias)
+    return x, y
+
 
 # ============================================================================
 # App Icons (amber glyph on dark background with rounded corners)
@@ -67,18 +138,11 @@ def create_app_icon(size: int, corner_radius_ratio: float = 0.1875) -> Image.Ima
 
     # Render the hieroglyph
     font_size = int(size * GLYPH_SCALE)
-    font = ImageFont.truetype(FONT_PATH, font_size)
-
-    # Get bounding box to centre properly
-    bbox = font.getbbox(CHAR)
-    glyph_w = bbox[2] - bbox[0]
-    glyph_h = bbox[3] - bbox[1]
 
     # Centre the glyph (slight upward shift looks better)
-    x = (size - glyph_w) // 2 - bbox[0]
-    y = (size - glyph_h) // 2 - bbox[1] - int(size * 0.02)
+    x, y = _centered_xy(font_size, size, y_bias=0.02)
 
-    draw.text((x, y), CHAR, font=font, fill=AMBER)
+    draw.text((x, y), CHAR, font=_font(font_size), fill=AMBER)
 
     return img
 
@@ -87,89 +151,135 @@ def create_app_icon(size: int, corner_radius_ratio: float = 0.1875) -> Image.Ima
 # Tray Icons (glyph silhouette on transparent background)
 # ============================================================================
 
-def create_tray_icon(size: int, r: int, g: int, b: int) -> Image.Image:
-    """Create a tray icon: filled glyph silhouette on transparent background.
+if njit is not None:
+
+    @njit(cache=True)
+    def _flood_exterior_jit(arr):
+        """Numba version of flood_exterior() on a 2D uint8 array (0 = background).
+
+        Same scanline algorithm, with a preallocated flat-index stack so the
+        inner loop never allocates.
+        """
+        h, w = arr.shape
+        stack = np.empty(4 * w * h, dtype=np.int32)
+        top = 0
+        for x in range(w):
+            stack[top] = x
+            stack[top + 1] = (h - 1) * w + x
+            top += 2
+        for y in range(h):
+            stack[top] = y * w
+            stack[top + 1] = y * w + w - 1
+            top += 2
+
+        while top > 0:
+            top -= 1
+            y, x = divmod(stack[top], w)
+            if arr[y, x] != 0:
+                continue
+
+            left = x
+            while left > 0 and arr[y, left - 1] == 0:
+                left -= 1
+            right = x
+            while right < w - 1 and arr[y, right + 1] == 0:
+                right += 1
+            for cx in range(left, right + 1):
+                arr[y, cx] = 128
+
+            for ny in (y - 1, y + 1):
+                if ny < 0 or ny >= h:
+                    continue
+                in_run = False
+                for cx in range(left, right + 1):
+                    if arr[ny, cx] == 0:
+                        if not in_run:
+                            stack[top] = ny * w + cx
+                            top += 1
+                            in_run = True
+                    else:
+                        in_run = False
+
+
+def _tray_alpha(render_size: int) -> Image.Image:
+    """Render the filled glyph silhouette as an L-mode mask (255 inside).
 
     The Noto font renders 𓅝 as an outline/line drawing. For a proper menu bar
     icon we need a solid filled shape. Strategy:
     1. Render the glyph in white on a black background at high resolution.
     2. Threshold to create a binary mask of the glyph strokes.
-    3. Flood-fill the exterior (black region reachable from edges) with grey.
-    4. Everything that's still black is an interior enclosed region — fill it white.
-    5. Combine stroke mask + interior fill → solid silhouette alpha mask.
-    6. Apply the desired colour using the mask as alpha.
+    3. Fill holes: background not connected to the edges is an enclosed interior.
+    4. Strokes + filled interiors → solid silhouette alpha mask.
+
+    Filling the glyph's vector path instead (e.g. Cairo text_path + fill) does
+    not give a silhouette: the strokes are the glyph's contours, so the enclosed
+    regions come out as counters or gaps between overlapping strokes, not as
+    filled shapes. Filling them needs the raster step above.
+
+    The mask is colour-independent, so one render serves every tray variant.
     """
-    # Render at 8x for quality
-    render_size = size * 8
     font_size = int(render_size * 0.85)
-    font = ImageFont.truetype(FONT_PATH, font_size)
 
     # Step 1: Render glyph in white on black
     canvas = Image.new("L", (render_size, render_size), 0)
     draw = ImageDraw.Draw(canvas)
 
-    bbox = font.getbbox(CHAR)
-    glyph_w = bbox[2] - bbox[0]
-    glyph_h = bbox[3] - bbox[1]
+    x, y = _centered_xy(font_size, render_size)
+    draw.text((x, y), CHAR, font=_font(font_size), fill=255)
 
-    x = (render_size - glyph_w) // 2 - bbox[0]
-    y = (render_size - glyph_h) // 2 - bbox[1]
+    if np is None or (binary_fill_holes is None and njit is None):
+        # Pure-Python fallback: threshold, flood-fill the exterior with a
+        # marker value (128), then keep everything that isn't exterior.
+        stroke_mask = canvas.point(lambda p: 255 if p > 30 else 0)
+        pixels = bytearray(stroke_mask.tobytes())
+        flood_exterior(pixels, render_size, render_size)
+        fill_mask = Image.frombytes("L", stroke_mask.size, bytes(pixels))
+        return fill_mask.point(lambda p: 0 if p == 128 else 255)
 
-    draw.text((x, y), CHAR, font=font, fill=255)
+    # One working buffer carries the glyph render → stroke mask → alpha
+    arr = np.array(canvas)
 
     # Step 2: Threshold to get a clean stroke mask
-    stroke_mask = canvas.point(lambda p: 255 if p > 30 else 0)
-
-    # Step 3: Flood-fill exterior from all edges with a marker value (128)
-    # Use a copy to identify which black pixels are exterior
-    fill_canvas = stroke_mask.copy()
-    from PIL import ImageDraw as ID2
-    fill_draw = ID2.Draw(fill_canvas)
-
-    # Flood fill from all four edges to mark exterior
-    from collections import deque
-    pixels = fill_canvas.load()
-    w, h = fill_canvas.size
-    visited = set()
-    queue = deque()
-
-    # Seed from all edge pixels that are black (exterior)
-    for i in range(w):
-        if pixels[i, 0] == 0:
-            queue.append((i, 0))
-        if pixels[i, h - 1] == 0:
-            queue.append((i, h - 1))
-    for j in range(h):
-        if pixels[0, j] == 0:
-            queue.append((0, j))
-        if pixels[w - 1, j] == 0:
-            queue.append((w - 1, j))
-
-    # BFS flood fill exterior
-    while queue:
-        cx, cy = queue.popleft()
-        if (cx, cy) in visited:
-            continue
-        if cx < 0 or cx >= w or cy < 0 or cy >= h:
-            continue
-        if pixels[cx, cy] != 0:  # Stop at glyph strokes
-            continue
-        visited.add((cx, cy))
-        pixels[cx, cy] = 128  # Mark as exterior
-        queue.append((cx + 1, cy))
-        queue.append((cx - 1, cy))
-        queue.append((cx, cy + 1))
-        queue.append((cx, cy - 1))
-
-    # Step 4: Anything still black (value 0) is interior — set to white
-    # Combine: stroke (255) + interior (0→255) + exterior (128→0)
-    alpha_mask = fill_canvas.point(lambda p: 0 if p == 128 else 255)
-
-    # Step 5: Create the final RGBA image
-    img = Image.new("RGBA", (render_size, render_size), (r, g, b, 255))
-    img.putalpha(alpha_mask)
-
-    return img.resize((size, size), Image.LANCZOS)
+    stroke = arr > 30
+
+    # Step 3: Fill every enclosed region. binary_fill_holes labels the
+    # background component connected to the border (the exterior) and turns
+    # everything else — strokes plus enclosed interiors — on.
+    if binary_fill_holes is not None:
+        filled = binary_fill_holes(stroke)
+    else:
+        arr[:] = 0
+        arr[stroke] = 255
+        _flood_exterior_jit(arr)
+        filled = arr != 128
+
+    # Step 4: Solid silhouette alpha mask, written back into the buffer
+    arr[:] = 0
+    arr[filled] = 255
+
+    return Image.fromarray(arr, "L")
+
+
+def _tray_mask(alpha: Image.Image, size: int) -> Image.Image:
+    """Downscale the silhouette mask to a tray icon size.
+
+    Uses a BOX filter: area-averaging sub-pixel coverage is the right
+    antialiasing for a hard-edged mask, and unlike LANCZOS it can't ring.
+    """
+    return alpha.resize((size, size), Image.BOX)
+
+
+def _tray_colored(mask: Image.Image, rgb: tuple[int, int, int]) -> Image.Image:
+    """Apply a colour to a tray-size silhouette mask.
+
+    The colour is painted only where the mask is non-zero, so transparent
+    pixels stay (0, 0, 0, 0).
+    """
+    img = Image.new("RGBA", mask.size, (0, 0, 0, 0))
+    img.paste(rgb + (255,), mask=mask.point(lambda p: 255 if p else 0))
+    img.putalpha(mask)
+
+    return img
 
 
 # ============================================================================
@@ -177,6 +287,28 @@ def create_tray_icon(size: int, r: int, g: int, b: int) -> Image.Image:
 # ============================================================================
 
 def main() -> None:
+    # Render the tray silhouette once; every size and colour derives from it
+    tray_alpha = _tray_alpha(max(TRAY_SIZES) * TRAY_SUPERSAMPLE)
+
+    # Each render and each downscale is done once and shared by every output
+    # using it. The 4x render behind a small size is shared too, so 16px and
+    # 32px reuse the 64px and 128px icons.
+    renders: dict[int, Image.Image] = {}
+    downscaled: dict[int, Image.Image] = {}
+
+    def render(size: int) -> Image.Image:
+        if size not in renders:
+            renders[size] = create_app_icon(size)
+        return renders[size]
+
+    def app_icon(size: int) -> Image.Image:
+        if size >= 64:
+            return render(size)
+        if size not in downscaled:
+            # Small sizes: render at 4x and downscale for quality
+            downscaled[size] = render(size * 4).resize((size, size), Image.LANCZOS)
+        return downscaled[size]
+
     # --- App icons (Tauri-required sizes) ---
     app_icon_sizes = {
         "icon.png": 1024,
@@ -186,35 +318,25 @@ def main() -> None:
     }
 
     for filename, size in app_icon_sizes.items():
-        if size < 64:
-            # Small sizes: render at 4x and downscale for quality
-            big = create_app_icon(size * 4)
-            img = big.resize((size, size), Image.LANCZOS)
-        else:
-            img = create_app_icon(size)
-
+        img = app_icon(size)
         path = ICONS_DIR / filename
-        img.save(path)
+        img.save(path, **SHIPPED_PNG_OPTIONS)
         print(f"  {filename} ({size}x{size}): {os.path.getsize(path)} bytes")
 
     # --- Favicon ---
-    favicon = create_app_icon(128)
-    favicon_32 = favicon.resize((32, 32), Image.LANCZOS)
+    favicon_32 = app_icon(32)
     favicon_path = STATIC_DIR / "favicon.png"
-    favicon_32.save(favicon_path)
+    favicon_32.save(favicon_path, **SHIPPED_PNG_OPTIONS)
     print(f"  favicon.png: {os.path.getsize(favicon_path)} bytes")
 
     # --- Tray icons (22 standard, 44 Retina) ---
-    for tray_size in [22, 44]:
-        idle = create_tray_icon(tray_size, 0, 0, 0)
-        idle_path = ICONS_DIR / f"tray-idle-{tray_size}.png"
-        idle.save(idle_path)
-        print(f"  tray-idle-{tray_size}.png: {os.path.getsize(idle_path)} bytes")
-
-        rec = create_tray_icon(tray_size, *AMBER[:3])
-        rec_path = ICONS_DIR / f"tray-recording-{tray_size}.png"
-        rec.save(rec_path)
-        print(f"  tray-recording-{tray_size}.png: {os.path.getsize(rec_path)} bytes")
+    for size in TRAY_SIZES:
+        mask = _tray_mask(tray_alpha, size)
+        for name, rgb in TRAY_VARIANTS:
+            filename = f"tray-{name}-{size}.png"
+            path = ICONS_DIR / filename
+            _tray_colored(mask, rgb).save(path, **SHIPPED_PNG_OPTIONS)
+            print(f"  {filename}: {os.path.getsize(path)} bytes")
 
     # --- .icns (macOS iconset → iconutil) ---
     iconset_dir = Path(tempfile.mkdtemp()) / "thoth.iconset"
@@ -233,28 +355,36 @@ def main() -> None:
         "icon_512x512@2x.png": 1024,
     }
 
+    # Iconset PNGs are thrown away once iconutil has read them, so skip the
+    # deflate effort
     for filename, size in iconset_sizes.items():
-        if size < 64:
-            big = create_app_icon(size * 4)
-            img = big.resize((size, size), Image.LANCZOS)
-        else:
-            img = create_app_icon(size)
-        img.save(iconset_dir / filename)
+        img = app_icon(size)
+        img.save(iconset_dir / filename, compress_level=1)
 
     icns_path = ICONS_DIR / "icon.icns"
-    ret = os.system(f"iconutil -c icns '{iconset_dir}' -o '{icns_path}'")
+    try:
+        ret = subprocess.run(
+            ["iconutil", "-c", "icns", str(iconset_dir), "-o", str(icns_path)],
+            check=False,
+        ).returncode
+    except FileNotFoundError:
+        ret = 1
     if ret == 0:
         print(f"  icon.icns: {os.path.getsize(icns_path)} bytes")
     else:
         print("  WARNING: iconutil failed (macOS only)")
 
     # --- .ico (Windows, multi-size) ---
-    src_256 = create_app_icon(256)
+    # Each frame is rendered at its own size rather than letting Pillow
+    # shrink the 256px frame, which softens the small sizes
+    ico_sizes = [256, 128, 64, 48, 32, 16]
+    frames = [app_icon(size) for size in ico_sizes]
     ico_path = ICONS_DIR / "icon.ico"
-    src_256.save(
+    frames[0].save(
         ico_path,
         format="ICO",
-        sizes=[(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)],
+        sizes=[(size, size) for size in ico_sizes],
+        append_images=frames[1:],
     )
     print(f"  icon.ico: {os.path.getsize(ico_path)} bytes")
 
@@ -0,0 +1,52 @@
+"""Pure-Python exterior flood fill for the tray icon silhouette.
+
+Used by generate_icons.py when neither SciPy nor Numba is installed. It is
+kept in its own strictly typed module so it can be compiled with mypyc for a
+faster fallback:
+
+    cd scripts && mypyc icon_flood_fill.py
+
+Run it from this directory so the compiled extension lands next to this file,
+where it is imported in its place.
+"""
+
+
+def flood_exterior(pixels: bytearray, w: int, h: int) -> None:
+    """Mark every background pixel (0) reachable from the image edge with 128.
+
+    ``pixels`` is a row-major L-mode buffer, indexed flat as ``y * w + x``.
+    Scanline fill: each seed is extended left and right across its row, and only
+    the first pixel of each background run directly above and below that span is
+    pushed as a new seed. Marked pixels are no longer 0, so they double as the
+    visited set.
+    """
+    size = w * h
+    stack: list[int] = list(range(w)) + list(range(size - w, size))
+    stack += list(range(0, size, w)) + list(range(w - 1, size, w))
+
+    while stack:
+        i = stack.pop()
+        if pixels[i] != 0:  # Glyph stroke, or already marked as exterior
+            continue
+
+        row_start = i - i % w
+        row_end = row_start + w - 1
+        left = i
+        while left > row_start and pixels[left - 1] == 0:
+            left -= 1
+        right = i
+        while right < row_end and pixels[right + 1] == 0:
+            right += 1
+        pixels[left:right + 1] = b"\x80" * (right - left + 1)  # Mark as exterior
+
+        for offset in (-w, w):
+            if left + offset < 0 or left + offset >= size:
+                continue
+            in_run = False
+            for j in range(left + offset, right + offset + 1):
+                if pixels[j] == 0:
+                    if not in_run:
+                        stack.append(j)
+                        in_run = True
+                else:
+                    in_run = False